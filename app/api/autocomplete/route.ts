@@ -0,0 +1,243 @@
+import { NextRequest, NextResponse } from 'next/server';
+import path from 'path';
+import fs from 'fs';
+
+// Title autocomplete over data/<folder>/autocomplete.json (built by
+// build_indices.py). Pure sorted-array lookups, so keystroke traffic never
+// loads the embedding model.
+export const dynamic = 'force-dynamic';
+
+interface ItemMeta {
+  id: string;
+  type: string;
+  title: string;
+  popularity: number;
+}
+
+type AutocompleteIndex = {
+  keys: string[];
+  rows: number[];
+  kinds: number[]; // 0 = title start, 1 = later word or alias
+  metadata: ItemMeta[];
+  // Kind-0 entries only, same order; typo matching runs over these
+  titleKeys: string[];
+  titleRows: number[];
+};
+
+const folderMap: Record<string, string> = {
+  anime: 'anime',
+  movie: 'movies',
+  book: 'books',
+  music: 'music'
+};
+
+const cache: Record<string, AutocompleteIndex | null> = {};
+
+function loadIndex(category: string): AutocompleteIndex | null {
+  if (!(category in folderMap)) {
+    throw new Error("Invalid category");
+  }
+  if (category in cache) return cache[category];
+
+  const dir = path.join(process.cwd(), 'data', folderMap[category]);
+  const indexPath = path.join(dir, 'autocomplete.json');
+  const metaPath = path.join(dir, 'metadata.json');
+
+  if (!fs.existsSync(indexPath) || !fs.existsSync(metaPath)) {
+    console.warn(`Autocomplete index not found for ${category}`);
+    cache[category] = null;
+    return null;
+  }
+
+  const index = JSON.parse(fs.readFileSync(indexPath, 'utf-8'));
+  const titleKeys: string[] = [];
+  const titleRows: number[] = [];
+  index.kinds.forEach((kind: number, i: number) => {
+    if (kind === 0) {
+      titleKeys.push(index.keys[i]);
+      titleRows.push(index.rows[i]);
+    }
+  });
+  cache[category] = {
+    ...index,
+    metadata: JSON.parse(fs.readFileSync(metaPath, 'utf-8')),
+    titleKeys,
+    titleRows
+  };
+  return cache[category];
+}
+
+// Same rule as normalize_title() in data/scripts/build_indices.py: NFKD,
+// drop combining marks, lowercase, non-letter/number runs -> one space
+function normalizeTitle(text: string): string {
+  return text
+    .normalize('NFKD')
+    .replace(/\p{M}/gu, '')
+    .toLowerCase()
+    .replace(/[^\p{L}\p{N}]+/gu, ' ')
+    .trim();
+}
+
+// First index in [lo, hi) whose key is >= target
+function lowerBound(keys: string[], target: string, lo = 0, hi = keys.length): number {
+  while (lo < hi) {
+    const mid = (lo + hi) >>> 1;
+    if (keys[mid] < target) lo = mid + 1;
+    else hi = mid;
+  }
+  return lo;
+}
+
+// Most title keys one typo scan may visit. The scan walks keys in order, so
+// this caps its cost as catalogs grow; today's largest bucket (books, "t")
+// is about 3,200 keys.
+const FUZZY_WINDOW = 4096;
+
+// Calls onMatch(i) for every key in [lo, hi) that has a prefix within
+// maxEdits of `query`. Keys are sorted, so the DP rows for a shared prefix
+// are reused from the previous key (a trie walk over the sorted array), and
+// once a prefix decides the outcome, later keys sharing it inherit it.
+function fuzzyPrefixScan(
+  keys: string[], lo: number, hi: number, query: string, maxEdits: number,
+  onMatch: (i: number) => void
+) {
+  const m = query.length;
+  const maxDepth = m + maxEdits;
+  const cap = maxEdits + 1;
+  const codes = Int32Array.from(query, ch => ch.charCodeAt(0));
+  const dp: Int32Array[] = [];
+  for (let d = 0; d <= maxDepth; d++) dp.push(new Int32Array(m + 1));
+  for (let j = 0; j <= m; j++) dp[0][j] = j;
+
+  let prevKey = '';
+  let valid = 0;       // dp[0..valid] hold prevKey's rows
+  let decided = 0;     // depth at which prevKey's outcome was fixed (0 = never)
+  let matched = false;
+  for (let i = lo; i < hi; i++) {
+    const key = keys[i];
+    let shared = 0;
+    const sharedLimit = Math.min(valid, key.length, prevKey.length);
+    while (shared < sharedLimit && key.charCodeAt(shared) === prevKey.charCodeAt(shared)) shared++;
+
+    if (decided > 0 && shared >= decided) {
+      if (matched) onMatch(i);
+      continue;
+    }
+
+    decided = 0;
+    matched = false;
+    const depthLimit = Math.min(key.length, maxDepth);
+    let depth = shared;
+    while (depth < depthLimit) {
+      depth++;
+      const above = dp[depth - 1];
+      const row = dp[depth];
+      const c = key.charCodeAt(depth - 1);
+      // Only the band |j - depth| <= maxEdits can stay within maxEdits, so
+      // cells outside it are never computed and read as `cap`
+      const from = Math.max(1, depth - maxEdits);
+      const to = Math.min(m, depth + maxEdits);
+      const aboveTo = depth - 1 + maxEdits;
+      row[0] = depth;
+      let left = from === 1 ? depth : cap;
+      let rowMin = Math.min(depth, cap);
+      for (let j = from; j <= to; j++) {
+        const up = j <= aboveTo ? above[j] : cap;
+        const cost = codes[j - 1] === c ? 0 : 1;
+        const cell = Math.min(up + 1, left + 1, above[j - 1] + cost, cap);
+        row[j] = cell;
+        left = cell;
+        if (cell < rowMin) rowMin = cell;
+      }
+      const reached = to === m && row[m] <= maxEdits;
+      if (reached || rowMin > maxEdits) {
+        decided = depth;
+        matched = reached;
+        break;
+      }
+    }
+    if (matched) onMatch(i);
+    valid = depth;
+    prevKey = key;
+  }
+}
+
+type Completion = { row: number; tier: number; popularity: number };
+
+function lookup(index: AutocompleteIndex, rawQuery: string, k: number) {
+  const query = normalizeTitle(rawQuery);
+  if (!query) return [];
+
+  // Best k rows by tier (0 title prefix, 1 word/alias prefix, 2 fuzzy),
+  // then popularity. Kept sorted; a row appears at most once.
+  const best: Completion[] = [];
+  const consider = (row: number, tier: number) => {
+    const popularity = index.metadata[row].popularity;
+    if (best.length === k) {
+      const worst = best[k - 1];
+      if (tier > worst.tier || (tier === worst.tier && popularity <= worst.popularity)) return;
+    }
+    const existing = best.findIndex(c => c.row === row);
+    if (existing >= 0) {
+      if (best[existing].tier <= tier) return;
+      best.splice(existing, 1);
+    }
+    let pos = best.length;
+    while (pos > 0 && (tier < best[pos - 1].tier ||
+           (tier === best[pos - 1].tier && popularity > best[pos - 1].popularity))) pos--;
+    if (pos >= k) return;
+    best.splice(pos, 0, { row, tier, popularity });
+    if (best.length > k) best.pop();
+  };
+
+  // 1. Exact prefix range in the sorted key array
+  const start = lowerBound(index.keys, query);
+  for (let i = start; i < index.keys.length && index.keys[i].startsWith(query); i++) {
+    consider(index.rows[i], index.kinds[i]);
+  }
+
+  // 2. Typo tolerance, only when prefixes come up short. Candidates are
+  // whole-title keys sharing the query's first character; in big buckets
+  // only the FUZZY_WINDOW keys sorted nearest the query are scanned, which
+  // still catches typos past the first few characters.
+  const maxEdits = query.length < 4 ? 0 : query.length < 8 ? 1 : 2;
+  if (best.length < k && maxEdits > 0) {
+    const keys = index.titleKeys;
+    const first = query[0];
+    const bucketStart = lowerBound(keys, first);
+    const bucketEnd = lowerBound(keys, String.fromCharCode(first.charCodeAt(0) + 1), bucketStart);
+    const pos = lowerBound(keys, query, bucketStart, bucketEnd);
+    const end = Math.min(bucketEnd, Math.max(bucketStart, pos - FUZZY_WINDOW / 2) + FUZZY_WINDOW);
+    const begin = Math.max(bucketStart, end - FUZZY_WINDOW);
+    fuzzyPrefixScan(keys, begin, end, query, maxEdits, i => consider(index.titleRows[i], 2));
+  }
+
+  return best.map(({ row, tier }) => ({ ...index.metadata[row], fuzzy: tier === 2 }));
+}
+
+export async function GET(request: NextRequest) {
+  try {
+    const category = request.nextUrl.searchParams.get('category');
+    const query = request.nextUrl.searchParams.get('q');
+    const requested = parseInt(request.nextUrl.searchParams.get('k') || '8');
+    const k = Math.min(Math.max(Number.isFinite(requested) ? requested : 8, 1), 50);
+
+    if (!category || !query) {
+      return NextResponse.json({ error: 'Missing category or q' }, { status: 400 });
+    }
+
+    const index = loadIndex(category);
+    if (!index) {
+      return NextResponse.json({ results: [] });
+    }
+
+    const start = performance.now();
+    const results = lookup(index, query, k);
+    const tookMs = performance.now() - start;
+
+    return NextResponse.json({ results, tookMs });
+  } catch (error: any) {
+    console.error('Autocomplete error:', error);
+    return NextResponse.json({ error: 'Internal server error', details: error.message }, { status: 500 });
+  }
+}
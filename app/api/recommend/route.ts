@@ -8,23 +8,28 @@ export const dynamic = 'force-dynamic';
 
 interface ItemMeta {
   id: string;
+  external_id?: string;
   type: string;
   title: string;
   genres: string[];
   popularity: number;
 }
 
+// Pre-resolved image URLs from data/scripts/hydrate_images.py (null = no image)
+type ImageEntry = { image: string; thumbnail: string } | null;
+
 type CategoryCache = {
   embeddings: Float32Array | null;
   metadata: ItemMeta[] | null;
+  images: Record<string, ImageEntry> | null;
   dimension: number;
 };
 
 const cache: Record<string, CategoryCache> = {
-  anime: { embeddings: null, metadata: null, dimension: 384 },
-  movie: { embeddings: null, metadata: null, dimension: 384 },
-  book: { embeddings: null, metadata: null, dimension: 384 },
-  music: { embeddings: null, metadata: null, dimension: 384 }
+  anime: { embeddings: null, metadata: null, images: null, dimension: 384 },
+  movie: { embeddings: null, metadata: null, images: null, dimension: 384 },
+  book: { embeddings: null, metadata: null, images: null, dimension: 384 },
+  music: { embeddings: null, metadata: null, images: null, dimension: 384 }
 };
 
 // Global embedder to save memory
@@ -85,6 +90,15 @@ async function loadCategory(category: string) {
     }
   }
 
+  if (!catCache.images) {
+    const imagesPath = path.join(process.cwd(), 'data', folder, 'images.json');
+    if (fs.existsSync(imagesPath)) {
+      catCache.images = JSON.parse(fs.readFileSync(imagesPath, 'utf-8'));
+    } else {
+      catCache.images = {};
+    }
+  }
+
   return catCache;
 }
 
@@ -164,7 +178,11 @@ async function search(category: string, query: string, k: number = 20) {
   const results = topResults.map(({ idx, similarity }) => {
     const item = catCache.metadata![idx];
     const score = (0.8 * similarity) + (0.2 * (item.popularity || 0));
-    return { ...item, score, similarity };
+    // Hydrated items always carry `image` (null when there is none), so the
+    // client can tell them from un-hydrated ones and skip the live fetch
+    const hydrated = catCache.images![item.id];
+    const images = hydrated === undefined ? {} : (hydrated ?? { image: null });
+    return { ...item, ...images, score, similarity };
   });
   
   // 6. Sort by final score and return top k
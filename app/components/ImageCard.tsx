@@ -9,12 +9,19 @@ interface Props {
 }
 
 export default function ImageCard({ item }: Props) {
-  const [imageUrl, setImageUrl] = useState<string | null>(null);
+  const [imageUrl, setImageUrl] = useState<string | null>(item.image ?? null);
   const [error, setError] = useState(false);
 
   useEffect(() => {
     let mounted = true;
     
+    // Images hydrated offline (images.json) need no API call; null means
+    // hydration found no image, so there is nothing to fetch either
+    if (item.image !== undefined) {
+      setImageUrl(item.image);
+      return;
+    }
+
     // Only attempt fetch if we have an external ID and haven't failed already
     if (!item.external_id || error) return;
 
@@ -59,7 +66,7 @@ export default function ImageCard({ item }: Props) {
       mounted = false;
       clearTimeout(timeout);
     };
-  }, [item.type, item.external_id, error]);
+  }, [item.type, item.external_id, item.image, error]);
 
   if (error || !imageUrl) {
     return (
@@ -71,11 +78,21 @@ export default function ImageCard({ item }: Props) {
 
   return (
     <div className="relative w-full h-full">
+      {item.thumbnail && imageUrl === item.image && (
+        // Tiny hydrated thumbnail as a blurred placeholder while the poster loads
+        // eslint-disable-next-line @next/next/no-img-element
+        <img
+          src={item.thumbnail}
+          alt=""
+          aria-hidden
+          className="absolute inset-0 w-full h-full object-cover blur-md scale-110"
+        />
+      )}
       {/* eslint-disable-next-line @next/next/no-img-element */}
       <img 
         src={imageUrl} 
         alt={item.title} 
-        className="w-full h-full object-cover transition-transform duration-500 group-hover:scale-105"
+        className="relative w-full h-full object-cover transition-transform duration-500 group-hover:scale-105"
         loading="lazy"
       />
       <div className="absolute inset-0 bg-gradient-to-t from-background via-transparent to-transparent opacity-80" />
@@ -6,4 +6,6 @@ export interface Item {
   text: string; // Content used for embeddings
   genres: string[];
   popularity: number; // Normalized 0-1
+  image?: string | null; // Pre-resolved poster URL (images.json); null = known to have none
+  thumbnail?: string; // Small version of `image`, shown while it loads
 }
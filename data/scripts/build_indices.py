@@ -2,60 +2,219 @@ import faiss
 import numpy as np
 import os
 import json
+import re
+import glob
+import zlib
+import argparse
+import unicodedata
+
+def shard_of(item_id, num_shards):
+    # Stable across runs and machines (unlike Python's salted hash())
+    return zlib.crc32(item_id.encode('utf-8')) % num_shards
+
+# Rows copied out of the memory-mapped embeddings per index.add() call
+ADD_CHUNK = 65536
+
+def build_shards(category, embeddings, item_ids, num_shards):
+    # Partition rows by hash of item ID. Each shard keeps the global row
+    # numbers of its vectors so partial results map back to metadata.json.
+    # `embeddings` is memory-mapped and shards are built one at a time from
+    # row chunks, so peak memory is one shard, not the whole category.
+    shard_dir = f'data/{category}/shards'
+    os.makedirs(shard_dir, exist_ok=True)
+
+    assignments = np.array([shard_of(item_id, num_shards) for item_id in item_ids])
+    d = embeddings.shape[1]
+
+    shards = []
+    for shard in range(num_shards):
+        rows = np.flatnonzero(assignments == shard).astype('int64')
+
+        index = faiss.IndexFlatIP(d)
+        for start in range(0, len(rows), ADD_CHUNK):
+            index.add(np.ascontiguousarray(embeddings[rows[start:start + ADD_CHUNK]], dtype='float32'))
+
+        index_path = f'{shard_dir}/shard_{shard:03d}.faiss'
+        rows_path = f'{shard_dir}/shard_{shard:03d}.rows.npy'
+        faiss.write_index(index, index_path)
+        np.save(rows_path, rows)
+
+        shards.append({
+            'shard': shard,
+            'index': index_path,
+            'rows': rows_path,
+            'size': int(len(rows))
+        })
+        print(f"  Shard {shard}: {len(rows)} vectors")
+
+    shard_map = {
+        'category': category,
+        'num_shards': num_shards,
+        'dimension': int(d),
+        'total': int(embeddings.shape[0]),
+        'partition': 'crc32(id) % num_shards',
+        'shards': shards
+    }
+
+    map_path = f'data/{category}/shard_map.json'
+    with open(map_path, 'w', encoding='utf-8') as f:
+        json.dump(shard_map, f, indent=2)
+    print(f"Saved shard map to {map_path}")
+
+    # Drop the unsharded index and shards left over from a build with more of them
+    listed = {path for shard in shards for path in (shard['index'], shard['rows'])}
+    remove_outputs([f'data/{category}/index.faiss'] +
+                   [path for path in shard_files(category) if path not in listed])
+
+def shard_files(category):
+    shard_dir = f'data/{category}/shards'
+    return sorted(glob.glob(f'{shard_dir}/shard_[0-9][0-9][0-9].faiss') +
+                  glob.glob(f'{shard_dir}/shard_[0-9][0-9][0-9].rows.npy'))
+
+def remove_outputs(paths):
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+            print(f"Removed stale {path}")
+
+def normalize_title(text):
+    # Same rule as normalizeTitle() in app/api/autocomplete/route.ts:
+    # NFKD, drop combining marks (\p{M}), lowercase, and collapse every run
+    # of characters that are not letters or numbers (\p{L}, \p{N}) to one
+    # space. Non-Latin titles keep their letters.
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(c for c in text if not unicodedata.category(c).startswith('M')).lower()
+    return re.sub(r'[\W_]+', ' ', text).strip()
+
+def utf16_key(text):
+    # Sort like JavaScript string comparison (UTF-16 code units), which the
+    # route's binary search relies on
+    return text.encode('utf-16-be')
+
+def build_autocomplete(category, full_items):
+    # Sorted array of normalized keys -> metadata row. Each title is indexed
+    # whole (kind 0) and from every later word onwards, plus any aliases
+    # (kind 1), so "kyojin" still completes "Shingeki no Kyojin".
+    entries = set()
+    for row, item in enumerate(full_items):
+        title = normalize_title(item['title'])
+        if title:
+            entries.add((title, row, 0))
+            words = title.split(' ')
+            for i in range(1, len(words)):
+                if len(words[i]) >= 2:
+                    entries.add((' '.join(words[i:]), row, 1))
+        for alias in item.get('aliases', []):
+            alias = normalize_title(alias)
+            if alias and alias != title:
+                entries.add((alias, row, 1))
+
+    # Keep only the best kind for a (key, row) pair
+    best = {}
+    for key, row, kind in entries:
+        if best.get((key, row), 2) > kind:
+            best[(key, row)] = kind
+    ordered = sorted(best.items(), key=lambda entry: (utf16_key(entry[0][0]), entry[0][1]))
+
+    autocomplete = {
+        'keys': [key for (key, _), _ in ordered],
+        'rows': [row for (_, row), _ in ordered],
+        'kinds': [kind for _, kind in ordered]
+    }
+
+    out_path = f'data/{category}/autocomplete.json'
+    with open(out_path, 'w', encoding='utf-8') as f:
+        json.dump(autocomplete, f, separators=(',', ':'))
+    print(f"Saved {len(ordered)} autocomplete keys to {out_path}")
+
+def build_index(category, full_items, num_shards):
+    emb_path = f'data/{category}/embeddings.npy'
+    if not os.path.exists(emb_path):
+        print(f"Skipping index for {category}: embeddings.npy not found")
+        return
+
+    print(f"Building index for {category}...")
+    embeddings = np.load(emb_path, mmap_mode='r')
+    
+    if len(embeddings.shape) != 2:
+        print(f"Skipping {category}: invalid embedding shape {embeddings.shape}")
+        return
+        
+    d = embeddings.shape[1]
+    
+    # Sharded builds skip the full index so no process holds every vector
+    if num_shards <= 1:
+        # IP = Inner Product (Cosine similarity if normalized)
+        index = faiss.IndexFlatIP(d)
+        index.add(np.ascontiguousarray(embeddings, dtype='float32'))
+
+        out_path = f'data/{category}/index.faiss'
+        faiss.write_index(index, out_path)
+        print(f"Saved index to {out_path}")
+
+        # Validating
+        print(f"Index size: {index.ntotal}")
+
+        # Shards from an earlier --shards build would otherwise still be served
+        remove_outputs([f'data/{category}/shard_map.json'] + shard_files(category))
+        shard_dir = f'data/{category}/shards'
+        if os.path.isdir(shard_dir) and not os.listdir(shard_dir):
+            os.rmdir(shard_dir)
+        return
+
+    if full_items is None:
+        print(f"Skipping shards for {category}: items.json not found")
+    elif len(full_items) != embeddings.shape[0]:
+        print(f"Skipping shards for {category}: {len(full_items)} items vs {embeddings.shape[0]} embeddings")
+    else:
+        print(f"Sharding {category} into {num_shards} shards...")
+        build_shards(category, embeddings, [item['id'] for item in full_items], num_shards)
+
+def build_metadata(category, full_items):
+    # Lightweight metadata (no text)
+    metadata = []
+    for item in full_items:
+        metadata.append({
+            'id': item['id'],
+            'type': item['type'],
+            'title': item['title'],
+            'genres': item['genres'],
+            'popularity': item['popularity']
+        })
+        # Kept for image hydration (see hydrate_images.py)
+        if item.get('external_id'):
+            metadata[-1]['external_id'] = item['external_id']
+        
+    meta_path = f'data/{category}/metadata.json'
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump(metadata, f)
+    print(f"Saved metadata to {meta_path}")
 
 def main():
+    parser = argparse.ArgumentParser(description='Build FAISS indices and metadata per category')
+    parser.add_argument('--shards', type=int, default=1,
+                        help='Partition each category into N shards for scatter-gather search (default: 1, unsharded)')
+    args = parser.parse_args()
+
     categories = ['anime', 'movies', 'books', 'music']
     
     for category in categories:
         try:
-            emb_path = f'data/{category}/embeddings.npy'
-            if not os.path.exists(emb_path):
-                print(f"Skipping {category}: embeddings.npy not found")
-                continue
-                
-            print(f"Building index for {category}...")
-            embeddings = np.load(emb_path)
-            
-            if len(embeddings.shape) != 2:
-                print(f"Skipping {category}: invalid embedding shape {embeddings.shape}")
-                continue
-                
-            d = embeddings.shape[1]
-            
-            # IP = Inner Product (Cosine similarity if normalized)
-            index = faiss.IndexFlatIP(d)
-            index.add(embeddings)
-            
-            out_path = f'data/{category}/index.faiss'
-            faiss.write_index(index, out_path)
-            print(f"Saved index to {out_path}")
-            
-            # Validating
-            print(f"Index size: {index.ntotal}")
-
-            # Also create lightweight metadata (no text)
+            full_items = None
             items_path = f'data/{category}/items.json'
-            if not os.path.exists(items_path):
-                print(f"Warning: {items_path} not found, skipping metadata")
-                continue
-                
-            with open(items_path, 'r', encoding='utf-8') as f:
-                full_items = json.load(f)['items']
-                
-            metadata = []
-            for item in full_items:
-                metadata.append({
-                    'id': item['id'],
-                    'type': item['type'],
-                    'title': item['title'],
-                    'genres': item['genres'],
-                    'popularity': item['popularity']
-                })
-                
-            meta_path = f'data/{category}/metadata.json'
-            with open(meta_path, 'w', encoding='utf-8') as f:
-                json.dump(metadata, f)
-            print(f"Saved metadata to {meta_path}")
+            if os.path.exists(items_path):
+                with open(items_path, 'r', encoding='utf-8') as f:
+                    full_items = json.load(f)['items']
+            else:
+                print(f"Warning: {items_path} not found, skipping metadata and autocomplete")
+
+            build_index(category, full_items, args.shards)
+
+            # Metadata and autocomplete only need items.json, not embeddings
+            if full_items is not None:
+                build_metadata(category, full_items)
+                # Rows refer to metadata.json order
+                build_autocomplete(category, full_items)
         except Exception as e:
             print(f"Error processing {category}: {e}")
 
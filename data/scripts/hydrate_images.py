@@ -0,0 +1,221 @@
+import aiohttp
+import asyncio
+import json
+import os
+import argparse
+
+# Offline image hydration: resolve poster + thumbnail URLs for every indexed
+# item once, and ship them as data/<category>/images.json next to
+# metadata.json. The app then renders images without calling Jikan/TMDB.
+#
+# The cache is keyed by item id. Items that resolve to "no image" (404, no
+# poster) are stored as null; items whose fetch failed are left out, so
+# re-running the script resumes where it stopped and retries only failures.
+
+JIKAN_BASE = 'https://api.jikan.moe/v4'
+TMDB_BASE = 'https://api.themoviedb.org/3'
+TMDB_IMAGE_BASE = 'https://image.tmdb.org/t/p'
+
+class RetryableError(Exception):
+    def __init__(self, status, retry_after=None):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+        self.retry_after = retry_after
+
+class FatalError(Exception):
+    # Fails every request to the host (bad or expired API key), so the
+    # category stops instead of burning one rejected call per item
+    pass
+
+class RateLimiter:
+    # Spaces requests to one host at most `rate` per second. defer() pushes
+    # the next slot out for every worker sharing the host, e.g. after a 429.
+    def __init__(self, rate):
+        self.interval = 1.0 / rate
+        self.next_slot = 0.0
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        loop = asyncio.get_running_loop()
+        async with self.lock:
+            now = loop.time()
+            wait = self.next_slot - now
+            self.next_slot = max(now, self.next_slot) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def defer(self, delay):
+        now = asyncio.get_running_loop().time()
+        self.next_slot = max(self.next_slot, now + delay)
+
+def parse_retry_after(value):
+    # Seconds form only; an HTTP-date (or junk) falls back to our own backoff
+    try:
+        return max(float(value), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+async def fetch_json(session, limiter, url, params=None, retries=4):
+    # Returns parsed JSON, or None on 404. Retries 429/5xx/network errors
+    # up to `retries` times with exponential backoff (or Retry-After when
+    # the server sends one). 401/403 raise FatalError; other 4xx raise at once.
+    for attempt in range(retries + 1):
+        await limiter.acquire()
+        try:
+            async with session.get(url, params=params) as resp:
+                if resp.status == 404:
+                    return None
+                if resp.status in (401, 403):
+                    raise FatalError(f"HTTP {resp.status} from {resp.url.host}, check the API key")
+                if resp.status == 429 or resp.status >= 500:
+                    raise RetryableError(resp.status, parse_retry_after(resp.headers.get('Retry-After')))
+                resp.raise_for_status()
+                return await resp.json()
+        except (RetryableError, aiohttp.ClientConnectionError, aiohttp.ClientPayloadError,
+                asyncio.TimeoutError) as e:
+            if attempt == retries:
+                raise
+            delay = getattr(e, 'retry_after', None) or 0.5 * (2 ** attempt)
+            if isinstance(e, RetryableError) and e.status == 429:
+                # Rate limited: back off the whole host, not just this worker
+                limiter.defer(delay)
+            else:
+                await asyncio.sleep(delay)
+
+async def resolve_anime(session, limiter, base, external_id):
+    data = await fetch_json(session, limiter, f'{base}/anime/{external_id}')
+    images = (((data or {}).get('data') or {}).get('images') or {}).get('jpg') or {}
+    if not images.get('large_image_url'):
+        return None
+    return {
+        'image': images['large_image_url'],
+        'thumbnail': images.get('small_image_url') or images['large_image_url']
+    }
+
+async def resolve_movie(session, limiter, base, external_id, api_key):
+    data = await fetch_json(session, limiter, f'{base}/movie/{external_id}', params={'api_key': api_key})
+    poster_path = (data or {}).get('poster_path')
+    if not poster_path:
+        return None
+    return {
+        'image': f'{TMDB_IMAGE_BASE}/w500{poster_path}',
+        'thumbnail': f'{TMDB_IMAGE_BASE}/w92{poster_path}'
+    }
+
+def save_cache(path, cache):
+    # Write-then-rename so an interrupted run never leaves a truncated file
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(cache, f)
+    os.replace(tmp_path, path)
+
+async def hydrate(category, resolve, args):
+    meta_path = f'data/{category}/metadata.json'
+    cache_path = f'data/{category}/images.json'
+
+    if not os.path.exists(meta_path):
+        print(f"Skipping {category}: metadata.json not found")
+        return
+
+    with open(meta_path, 'r', encoding='utf-8') as f:
+        metadata = json.load(f)
+
+    cache = {}
+    if os.path.exists(cache_path):
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+
+    todo = [item for item in metadata if item.get('external_id') and item['id'] not in cache]
+    if args.limit:
+        todo = todo[:args.limit]
+    print(f"Hydrating {category}: {len(todo)} to fetch, {len(cache)} already cached")
+    if not todo:
+        return
+
+    queue = asyncio.Queue()
+    for item in todo:
+        queue.put_nowait(item)
+
+    done = 0
+    failed = 0
+
+    async def worker():
+        nonlocal done, failed
+        while True:
+            try:
+                item = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                cache[item['id']] = await resolve(item['external_id'])
+                done += 1
+                if done % args.checkpoint == 0:
+                    save_cache(cache_path, cache)
+                    print(f"  {done}/{len(todo)} resolved")
+            except FatalError:
+                raise
+            except Exception as e:
+                failed += 1
+                print(f"  Failed {item['id']} ({item['external_id']}): {e}")
+
+    tasks = [asyncio.create_task(worker()) for _ in range(args.concurrency)]
+    try:
+        await asyncio.gather(*tasks)
+    except FatalError as e:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        print(f"Stopped {category}: {e}")
+    finally:
+        save_cache(cache_path, cache)
+        print(f"Saved {len(cache)} entries to {cache_path} ({failed} failed, re-run to retry)")
+
+async def run(args):
+    timeout = aiohttp.ClientTimeout(total=args.timeout)
+    # One pooled session for all hosts; limit_per_host caps open sockets
+    connector = aiohttp.TCPConnector(limit_per_host=args.concurrency)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        if 'anime' in args.categories:
+            limiter = RateLimiter(args.jikan_rate)
+            await hydrate('anime',
+                          lambda eid: resolve_anime(session, limiter, args.jikan_base, eid),
+                          args)
+
+        if 'movies' in args.categories:
+            api_key = os.environ.get('TMDB_API_KEY') or os.environ.get('NEXT_PUBLIC_TMDB_API_KEY')
+            if not api_key:
+                print("Skipping movies: set TMDB_API_KEY to hydrate movie posters")
+            else:
+                limiter = RateLimiter(args.tmdb_rate)
+                await hydrate('movies',
+                              lambda eid: resolve_movie(session, limiter, args.tmdb_base, eid, api_key),
+                              args)
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk-resolve poster URLs into data/<category>/images.json')
+    parser.add_argument('--categories', nargs='+', default=['anime', 'movies'], choices=['anime', 'movies'])
+    parser.add_argument('--jikan-base', default=JIKAN_BASE, help='Override for testing against a local stub server')
+    parser.add_argument('--tmdb-base', default=TMDB_BASE, help='Override for testing against a local stub server')
+    parser.add_argument('--jikan-rate', type=float, default=1.0,
+                        help='Max requests/sec to Jikan (its limits are 3/s and 60/min)')
+    parser.add_argument('--tmdb-rate', type=float, default=20.0, help='Max requests/sec to TMDB')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--timeout', type=float, default=15.0, help='Per-request timeout in seconds')
+    parser.add_argument('--checkpoint', type=int, default=100, help='Save progress every N items')
+    parser.add_argument('--limit', type=int, default=0, help='Only fetch the first N missing items')
+    args = parser.parse_args()
+    if args.jikan_rate <= 0 or args.tmdb_rate <= 0:
+        parser.error("--jikan-rate and --tmdb-rate must be positive")
+    if args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+    if args.timeout <= 0:
+        parser.error("--timeout must be positive")
+    if args.checkpoint < 1:
+        parser.error("--checkpoint must be at least 1")
+    if args.limit < 0:
+        parser.error("--limit must not be negative")
+
+    asyncio.run(run(args))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,218 @@
+import numpy as np
+import scipy.sparse as sp
+import json
+import os
+import time
+import argparse
+
+# Nightly batch recommendations for many user profiles.
+#
+# Input is JSONL, one profile per line:
+#   {"user": "u1", "liked": ["anime_1393", "movie_42"], "disliked": ["book_7"],
+#    "weights": {"anime_1393": 2.0}}
+# Each profile vector is the weighted mean of its liked item embeddings minus
+# a fraction of the mean of its disliked ones. Profiles are scored against
+# every category in blocks (one matrix-matrix product per block), seen items
+# are excluded, results get the same popularity blend as /api/recommend, and
+# top-k per profile is streamed to a JSONL output file as
+#   {"user": "u1", "recommendations": {"anime": {"ids": [...], "scores": [...]}}}
+
+CATEGORIES = ['anime', 'movies', 'books', 'music']
+
+# Keep in sync with the rerank in app/api/recommend/route.ts
+SIMILARITY_WEIGHT = 0.8
+POPULARITY_WEIGHT = 0.2
+
+def load_catalog(categories):
+    # Stacks every category's embeddings into one matrix so profile vectors
+    # can be built with a single sparse @ dense product. Each category's
+    # 'embeddings' is a view into that matrix, so vectors are held once.
+    catalog = {}
+    sources = []
+    offset = 0
+    for category in categories:
+        emb_path = f'data/{category}/embeddings.npy'
+        meta_path = f'data/{category}/metadata.json'
+        if not os.path.exists(emb_path) or not os.path.exists(meta_path):
+            print(f"Skipping {category}: embeddings.npy or metadata.json not found")
+            continue
+
+        # Memory-mapped until copied into the stacked matrix below
+        embeddings = np.load(emb_path, mmap_mode='r')
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            metadata = json.load(f)
+        if len(metadata) != len(embeddings):
+            print(f"Skipping {category}: {len(metadata)} items vs {len(embeddings)} embeddings")
+            continue
+        if sources and embeddings.shape[1] != sources[0].shape[1]:
+            # Profiles live in one embedding space shared by every category
+            print(f"Skipping {category}: dimension {embeddings.shape[1]} vs {sources[0].shape[1]}")
+            continue
+
+        catalog[category] = {
+            'ids': np.array([item['id'] for item in metadata], dtype=object),
+            'popularity': np.array([item.get('popularity', 0) for item in metadata], dtype='float32'),
+            'offset': offset
+        }
+        sources.append(embeddings)
+        offset += len(embeddings)
+        print(f"Loaded {category}: {len(embeddings)} items")
+
+    d = sources[0].shape[1] if sources else 0
+    all_embeddings = np.empty((offset, d), dtype='float32')
+    for entry, embeddings in zip(catalog.values(), sources):
+        start = entry['offset']
+        all_embeddings[start:start + len(embeddings)] = embeddings
+        entry['embeddings'] = all_embeddings[start:start + len(embeddings)]
+
+    id_to_col = {}
+    for entry in catalog.values():
+        for row, item_id in enumerate(entry['ids']):
+            id_to_col[item_id] = entry['offset'] + row
+    return catalog, all_embeddings, id_to_col
+
+def read_profiles(path, block_size):
+    block = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            block.append(json.loads(line))
+            if len(block) == block_size:
+                yield block
+                block = []
+    if block:
+        yield block
+
+def feedback_matrices(profiles, id_to_col, n_cols):
+    # Sparse (profiles x items) matrices of like weights and dislikes
+    liked_r, liked_c, liked_w = [], [], []
+    disliked_r, disliked_c = [], []
+    for r, profile in enumerate(profiles):
+        weights = profile.get('weights', {})
+        for item_id in profile.get('liked', []):
+            col = id_to_col.get(item_id)
+            if col is not None:
+                liked_r.append(r)
+                liked_c.append(col)
+                liked_w.append(float(weights.get(item_id, 1.0)))
+        for item_id in profile.get('disliked', []):
+            col = id_to_col.get(item_id)
+            if col is not None:
+                disliked_r.append(r)
+                disliked_c.append(col)
+
+    shape = (len(profiles), n_cols)
+    liked = sp.csr_matrix((np.array(liked_w, dtype='float32'), (liked_r, liked_c)), shape=shape)
+    disliked = sp.csr_matrix((np.ones(len(disliked_r), dtype='float32'), (disliked_r, disliked_c)), shape=shape)
+    return liked, disliked
+
+def weighted_mean(matrix, all_embeddings):
+    totals = np.asarray(matrix.sum(axis=1)).ravel()
+    sums = np.asarray(matrix @ all_embeddings)
+    nonzero = totals > 0
+    sums[nonzero] /= totals[nonzero, None]
+    return sums
+
+def profile_vectors(liked, disliked, all_embeddings, negative_weight):
+    vectors = weighted_mean(liked, all_embeddings)
+    if negative_weight > 0 and disliked.nnz:
+        vectors -= negative_weight * weighted_mean(disliked, all_embeddings)
+
+    # Normalize so the dot product with (normalized) item embeddings is cosine.
+    # Profiles with no known liked items have nothing to recommend from.
+    norms = np.linalg.norm(vectors, axis=1)
+    active = (norms > 1e-8) & (liked.getnnz(axis=1) > 0)
+    vectors[active] /= norms[active, None]
+    return vectors.astype('float32'), active
+
+def score_category(vectors, active, seen, entry, k):
+    # Returns (rows, scores), each (n_profiles x k); unused slots are -1 / -inf
+    n_items = len(entry['ids'])
+    sims = vectors @ entry['embeddings'].T
+
+    # Seen items (liked or disliked) can't be recommended back
+    start = entry['offset']
+    seen_rows, seen_cols = seen[:, start:start + n_items].nonzero()
+    sims[seen_rows, seen_cols] = -np.inf
+    sims[~active] = -np.inf
+
+    # Like the API: shortlist top 2k by similarity, then blend in popularity
+    shortlist = min(2 * k, n_items)
+    candidates = np.argpartition(sims, n_items - shortlist, axis=1)[:, n_items - shortlist:]
+    candidate_sims = np.take_along_axis(sims, candidates, axis=1)
+    blended = SIMILARITY_WEIGHT * candidate_sims + POPULARITY_WEIGHT * entry['popularity'][candidates]
+
+    order = np.argsort(-blended, axis=1, kind='stable')[:, :k]
+    rows = np.take_along_axis(candidates, order, axis=1)
+    scores = np.take_along_axis(blended, order, axis=1)
+    rows[~np.isfinite(scores)] = -1
+    return rows, scores
+
+def block_size_for(memory_mb, catalog):
+    # The largest live temporary is the (block x n_items) float32 similarity
+    # matrix plus argpartition's int64 index array of the same shape.
+    largest = max(len(entry['ids']) for entry in catalog.values())
+    bytes_per_profile = largest * (4 + 8)
+    return max(1, int(memory_mb * 1024 * 1024 // bytes_per_profile))
+
+def main():
+    parser = argparse.ArgumentParser(description='Batch top-k recommendations for user profiles')
+    parser.add_argument('--profiles', required=True, help='Input JSONL, one profile per line')
+    parser.add_argument('--out', required=True, help='Output JSONL, one result line per profile')
+    parser.add_argument('-k', type=int, default=20)
+    parser.add_argument('--categories', nargs='+', default=CATEGORIES, choices=CATEGORIES)
+    parser.add_argument('--negative-weight', type=float, default=0.5,
+                        help='How strongly disliked items push the profile away (0 disables)')
+    parser.add_argument('--memory-mb', type=float, default=512,
+                        help='Cap for per-block scoring buffers; sets profiles per block')
+    args = parser.parse_args()
+    if args.k < 1:
+        parser.error("-k must be at least 1")
+    if args.memory_mb <= 0:
+        parser.error("--memory-mb must be positive")
+
+    catalog, all_embeddings, id_to_col = load_catalog(args.categories)
+    if not catalog:
+        print("No categories loaded, nothing to do")
+        return
+
+    block_size = block_size_for(args.memory_mb, catalog)
+    print(f"Scoring in blocks of {block_size} profiles (~{args.memory_mb:g}MB cap)")
+
+    total = 0
+    cold = 0
+    start = time.perf_counter()
+    with open(args.out, 'w', encoding='utf-8') as out:
+        for profiles in read_profiles(args.profiles, block_size):
+            liked, disliked = feedback_matrices(profiles, id_to_col, len(all_embeddings))
+            vectors, active = profile_vectors(liked, disliked, all_embeddings, args.negative_weight)
+            seen = liked + disliked
+
+            results = [{} for _ in profiles]
+            for category, entry in catalog.items():
+                rows, scores = score_category(vectors, active, seen, entry, args.k)
+                scores = np.round(scores.astype('float64'), 4)
+                for p in range(len(profiles)):
+                    valid = rows[p] >= 0
+                    results[p][category] = {
+                        'ids': entry['ids'][rows[p][valid]].tolist(),
+                        'scores': scores[p][valid].tolist()
+                    }
+
+            lines = [json.dumps({'user': profile.get('user'), 'recommendations': recs})
+                     for profile, recs in zip(profiles, results)]
+            out.write('\n'.join(lines) + '\n')
+
+            total += len(profiles)
+            cold += int((~active).sum())
+            elapsed = time.perf_counter() - start
+            print(f"  {total} profiles, {total / elapsed:.0f} profiles/sec")
+
+    elapsed = time.perf_counter() - start
+    print(f"Wrote {total} profiles to {args.out} in {elapsed:.1f}s "
+          f"({total / max(elapsed, 1e-9):.0f} profiles/sec, {cold} with no usable history)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,460 @@
+import faiss
+import numpy as np
+import os
+import hmac
+import json
+import time
+import socket
+import struct
+import hashlib
+import argparse
+import selectors
+import socketserver
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import Process, Pipe
+
+# Scatter-gather search over the shards written by `build_indices.py --shards N`.
+#
+# Each shard worker holds one slice of a category's vectors and answers
+# top-k queries over it. Workers speak a small length-prefixed binary
+# protocol over TCP (raw float32/int64 arrays, never pickle), so the same
+# worker runs either as a local child process or as `shard_search.py serve`
+# on a remote node. Connections are authenticated with an HMAC challenge
+# over MEDIASAGE_SHARD_AUTHKEY; remote workers should still only be
+# reachable on a private network.
+
+AUTHKEY_ENV = 'MEDIASAGE_SHARD_AUTHKEY'
+CHALLENGE_SIZE = 32
+HANDSHAKE_TIMEOUT = 10.0
+# Seconds a local worker gets to load its shard and report its address
+STARTUP_TIMEOUT = 120.0
+
+# Frame = 4-byte length + payload
+FRAME = struct.Struct('!I')
+# Request payload header: seq, k, nq, d (then nq*d float32 queries)
+REQUEST = struct.Struct('!QIII')
+# Reply payload header: seq, status, nq, k (then scores + rows, or an error message)
+REPLY = struct.Struct('!QBII')
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+def load_shard_map(category):
+    map_path = f'data/{category}/shard_map.json'
+    with open(map_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def authkey_from_env():
+    authkey = os.environ.get(AUTHKEY_ENV)
+    return authkey.encode('utf-8') if authkey else None
+
+def merge_topk(partials, k):
+    # partials: list of (scores, rows), each of shape (nq, k_i).
+    # Order by score desc, then global row asc, so ties break the same way
+    # no matter how the rows were spread across shards.
+    scores = np.concatenate([p[0] for p in partials], axis=1)
+    rows = np.concatenate([p[1] for p in partials], axis=1)
+
+    nq = scores.shape[0]
+    k = min(k, scores.shape[1])
+    out_scores = np.empty((nq, k), dtype='float32')
+    out_rows = np.empty((nq, k), dtype='int64')
+    for q in range(nq):
+        order = np.lexsort((rows[q], -scores[q]))[:k]
+        out_scores[q] = scores[q][order]
+        out_rows[q] = rows[q][order]
+    return out_scores, out_rows
+
+def recv_exact(sock, n):
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            raise EOFError("Connection closed")
+        buf += chunk
+    return bytes(buf)
+
+def send_frame(sock, payload):
+    sock.sendall(FRAME.pack(len(payload)) + payload)
+
+def recv_frame(sock):
+    (length,) = FRAME.unpack(recv_exact(sock, FRAME.size))
+    return recv_exact(sock, length)
+
+def encode_reply(seq, scores, rows):
+    nq, k = scores.shape
+    return (REPLY.pack(seq, STATUS_OK, nq, k)
+            + np.ascontiguousarray(scores, dtype='float32').tobytes()
+            + np.ascontiguousarray(rows, dtype='int64').tobytes())
+
+def decode_reply(payload):
+    # Returns (seq, scores, rows); scores is None and rows the message on error
+    seq, status, nq, k = REPLY.unpack_from(payload)
+    body = payload[REPLY.size:]
+    if status != STATUS_OK:
+        return seq, None, body.decode('utf-8', 'replace')
+    split = nq * k * 4
+    scores = np.frombuffer(body[:split], dtype='float32').reshape(nq, k)
+    rows = np.frombuffer(body[split:], dtype='int64').reshape(nq, k)
+    return seq, scores, rows
+
+class ShardWorker:
+    def __init__(self, index_path, rows_path):
+        self.index = faiss.read_index(index_path)
+        self.rows = np.load(rows_path)
+
+    def search(self, queries, k):
+        k = min(k, self.index.ntotal)
+        if k == 0:
+            return (np.empty((len(queries), 0), dtype='float32'),
+                    np.empty((len(queries), 0), dtype='int64'))
+        scores, local = self.index.search(queries, k)
+        return scores, self.rows[local]
+
+class ShardHandler(socketserver.BaseRequestHandler):
+    # One thread per client connection. FAISS releases the GIL while
+    # searching, so concurrent coordinators don't serialize on a worker.
+    def handle(self):
+        sock = self.request
+        sock.settimeout(HANDSHAKE_TIMEOUT)
+        challenge = os.urandom(CHALLENGE_SIZE)
+        try:
+            send_frame(sock, challenge)
+            digest = recv_frame(sock)
+        except (OSError, EOFError):
+            return
+        expected = hmac.new(self.server.authkey, challenge, hashlib.sha256).digest()
+        if not hmac.compare_digest(digest, expected):
+            return
+        sock.settimeout(None)
+
+        worker = self.server.worker
+        while True:
+            try:
+                payload = recv_frame(sock)
+            except (OSError, EOFError):
+                return
+            seq = 0
+            try:
+                seq, k, nq, d = REQUEST.unpack_from(payload)
+                queries = np.frombuffer(payload[REQUEST.size:], dtype='float32').reshape(nq, d)
+                scores, rows = worker.search(queries, k)
+                reply = encode_reply(seq, scores, rows)
+            except Exception as e:
+                reply = REPLY.pack(seq, STATUS_ERROR, 0, 0) + str(e).encode('utf-8')
+            try:
+                send_frame(sock, reply)
+            except OSError:
+                return
+
+class ShardServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, worker, authkey):
+        super().__init__(address, ShardHandler)
+        self.worker = worker
+        self.authkey = authkey
+
+def _serve_local(shard, authkey, pipe):
+    worker = ShardWorker(shard['index'], shard['rows'])
+    with ShardServer(('127.0.0.1', 0), worker, authkey) as server:
+        pipe.send(server.server_address)
+        pipe.close()
+        server.serve_forever()
+
+def _wait_for_address(p, parent, shard, startup_timeout):
+    # The child's pipe end is closed in the parent, so a worker that dies
+    # while loading its shard shows up as EOF (or a dead process) instead of
+    # a recv() that blocks forever
+    deadline = time.monotonic() + startup_timeout
+    while not parent.poll(0.1):
+        if not p.is_alive():
+            raise RuntimeError(f"Shard {shard['shard']} worker exited during startup "
+                               f"(exit code {p.exitcode}); check {shard['index']} and {shard['rows']}")
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"Shard {shard['shard']} worker did not start within {startup_timeout}s")
+    try:
+        return parent.recv()
+    except EOFError:
+        p.join(1.0)
+        raise RuntimeError(f"Shard {shard['shard']} worker exited during startup "
+                           f"(exit code {p.exitcode}); check {shard['index']} and {shard['rows']}")
+
+def start_local_workers(shard_map, authkey, startup_timeout=STARTUP_TIMEOUT):
+    # Spawns one process per shard and returns (processes, addresses).
+    # If any worker fails to start, the ones already running are stopped.
+    processes, addresses = [], []
+    try:
+        for shard in shard_map['shards']:
+            parent, child = Pipe()
+            p = Process(target=_serve_local, args=(shard, authkey, child), daemon=True)
+            p.start()
+            child.close()
+            processes.append(p)
+            try:
+                addresses.append(_wait_for_address(p, parent, shard, startup_timeout))
+            finally:
+                parent.close()
+    except BaseException:
+        for p in processes:
+            p.terminate()
+        for p in processes:
+            p.join(1.0)
+        raise
+    return processes, addresses
+
+class Coordinator:
+    def __init__(self, addresses, authkey, timeout=1.0):
+        self.addresses = addresses
+        self.authkey = authkey
+        self.timeout = timeout
+        self.socks = [None] * len(addresses)
+        self.seq = 0
+        # Connects and sends run in parallel so one blackholed node can't
+        # eat the deadline of the others
+        self.pool = ThreadPoolExecutor(max_workers=len(addresses))
+
+    def _connect(self, shard, deadline):
+        # Connect, authenticate and return a socket, all within the deadline
+        sock = self.socks[shard]
+        if sock is not None:
+            return sock
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise socket.timeout("Deadline passed before connecting")
+        sock = socket.create_connection(self.addresses[shard], timeout=remaining)
+        try:
+            sock.settimeout(max(deadline - time.monotonic(), 1e-3))
+            challenge = recv_frame(sock)
+            send_frame(sock, hmac.new(self.authkey, challenge, hashlib.sha256).digest())
+        except BaseException:
+            sock.close()
+            raise
+        self.socks[shard] = sock
+        return sock
+
+    def _send(self, shard, deadline, request):
+        sock = self._connect(shard, deadline)
+        sock.settimeout(max(deadline - time.monotonic(), 1e-3))
+        send_frame(sock, request)
+        return sock
+
+    def _drop(self, shard):
+        # Closing is how a timed-out query is cancelled: the worker's next
+        # send fails and no stale work queues up behind later queries.
+        if self.socks[shard] is not None:
+            self.socks[shard].close()
+            self.socks[shard] = None
+
+    def search(self, queries, k=20):
+        # Returns (scores, rows, missing). Connecting, sending and receiving
+        # are all bounded by one deadline; shards that error or miss it are
+        # listed in `missing`, left out of the merge, and disconnected.
+        queries = np.ascontiguousarray(np.atleast_2d(queries), dtype='float32')
+        self.seq += 1
+        seq = self.seq
+        deadline = time.monotonic() + self.timeout
+        request = REQUEST.pack(seq, k, *queries.shape) + queries.tobytes()
+
+        sending = {shard: self.pool.submit(self._send, shard, deadline, request)
+                   for shard in range(len(self.addresses))}
+        selector = selectors.DefaultSelector()
+        buffers = {}
+        partials = []
+        missing = []
+
+        def fail(shard, message):
+            print(f"Shard {shard} {message}")
+            if shard in buffers:
+                selector.unregister(self.socks[shard])
+                del buffers[shard]
+            self._drop(shard)
+            missing.append(shard)
+
+        while sending or buffers:
+            # Start reading from shards as soon as their request is out
+            for shard, send in list(sending.items()):
+                if not send.done():
+                    continue
+                del sending[shard]
+                try:
+                    sock = send.result()
+                except (OSError, EOFError) as e:
+                    fail(shard, f"unreachable: {e}")
+                    continue
+                sock.setblocking(False)
+                selector.register(sock, selectors.EVENT_READ, shard)
+                buffers[shard] = bytearray()
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            # Poll briefly while sends are still in flight
+            for key, _ in selector.select(timeout=min(remaining, 0.005) if sending else remaining):
+                shard = key.data
+                try:
+                    chunk = key.fileobj.recv(1 << 16)
+                except BlockingIOError:
+                    continue
+                except OSError:
+                    chunk = b''
+                if not chunk:
+                    fail(shard, "disconnected")
+                    continue
+
+                buf = buffers[shard]
+                buf += chunk
+                if len(buf) < FRAME.size:
+                    continue
+                (length,) = FRAME.unpack_from(buf)
+                if len(buf) < FRAME.size + length:
+                    continue
+
+                reply_seq, scores, rows = decode_reply(bytes(buf[FRAME.size:FRAME.size + length]))
+                if scores is None:
+                    fail(shard, f"error: {rows}")
+                elif reply_seq != seq:
+                    fail(shard, "sent an out of sequence reply")
+                else:
+                    selector.unregister(key.fileobj)
+                    del buffers[shard]
+                    key.fileobj.setblocking(True)
+                    partials.append((scores, rows))
+
+        # Sends still running finish within moments: their sockets time out
+        # at the same deadline
+        for shard, send in sending.items():
+            try:
+                send.result()
+            except (OSError, EOFError):
+                pass
+            fail(shard, f"timed out after {self.timeout}s")
+        for shard in list(buffers):
+            fail(shard, f"timed out after {self.timeout}s")
+        selector.close()
+
+        if not partials:
+            return (np.empty((len(queries), 0), dtype='float32'),
+                    np.empty((len(queries), 0), dtype='int64'),
+                    sorted(missing))
+
+        scores, rows = merge_topk(partials, k)
+        return scores, rows, sorted(missing)
+
+    def close(self):
+        for shard in range(len(self.socks)):
+            self._drop(shard)
+        self.pool.shutdown(wait=False)
+
+def search_unsharded(category, queries, k=20, chunk_size=65536):
+    # Reference path over the full embeddings.npy, read in memory-mapped
+    # chunks so it works for categories too big for one process. Uses the
+    # same FAISS scoring and tie-break as the shards, so results can be
+    # compared row for row.
+    embeddings = np.load(f'data/{category}/embeddings.npy', mmap_mode='r')
+    queries = np.ascontiguousarray(np.atleast_2d(queries), dtype='float32')
+    partials = []
+    for start in range(0, len(embeddings), chunk_size):
+        chunk = np.ascontiguousarray(embeddings[start:start + chunk_size], dtype='float32')
+        index = faiss.IndexFlatIP(chunk.shape[1])
+        index.add(chunk)
+        scores, rows = index.search(queries, min(k, index.ntotal))
+        partials.append((scores, rows + start))
+    return merge_topk(partials, k)
+
+def parse_addresses(spec):
+    addresses = []
+    for part in spec.split(','):
+        host, port = part.rsplit(':', 1)
+        addresses.append((host, int(port)))
+    return addresses
+
+def main():
+    parser = argparse.ArgumentParser(description='Sharded scatter-gather vector search')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_serve = sub.add_parser('serve', help=f'Serve one shard over TCP (remote node, requires {AUTHKEY_ENV})')
+    p_serve.add_argument('--category', required=True)
+    p_serve.add_argument('--shard', type=int, required=True)
+    p_serve.add_argument('--host', default='127.0.0.1',
+                         help='Interface to bind; only use a private-network address for remote nodes')
+    p_serve.add_argument('--port', type=int, default=7100)
+
+    for name, help_text in [('query', 'Run a text query through the coordinator'),
+                            ('verify', 'Check sharded results match the unsharded index')]:
+        p = sub.add_parser(name, help=help_text)
+        p.add_argument('--category', required=True)
+        p.add_argument('--workers', help=f'Comma-separated host:port list (requires {AUTHKEY_ENV}; '
+                                         'default: spawn local processes)')
+        p.add_argument('-k', type=int, default=20)
+        p.add_argument('--timeout', type=float, default=1.0)
+        if name == 'query':
+            p.add_argument('--text', required=True)
+        else:
+            p.add_argument('--queries', type=int, default=100)
+
+    args = parser.parse_args()
+    shard_map = load_shard_map(args.category)
+    authkey = authkey_from_env()
+
+    if args.command == 'serve':
+        if authkey is None:
+            parser.error(f"serve requires {AUTHKEY_ENV} to be set to a shared secret")
+        shard = shard_map['shards'][args.shard]
+        worker = ShardWorker(shard['index'], shard['rows'])
+        print(f"Serving {args.category} shard {args.shard} ({shard['size']} vectors) on {args.host}:{args.port}")
+        with ShardServer((args.host, args.port), worker, authkey) as server:
+            server.serve_forever()
+        return
+
+    if args.workers:
+        if authkey is None:
+            parser.error(f"--workers requires {AUTHKEY_ENV} to match the one the workers were started with")
+        addresses = parse_addresses(args.workers)
+    else:
+        # Local workers only listen on 127.0.0.1; a per-run key is enough
+        authkey = authkey or os.urandom(32)
+        print(f"Starting {shard_map['num_shards']} local shard workers...")
+        try:
+            _, addresses = start_local_workers(shard_map, authkey)
+        except RuntimeError as e:
+            parser.exit(1, f"Error: {e}\n")
+
+    coordinator = Coordinator(addresses, authkey, timeout=args.timeout)
+    try:
+        if args.command == 'query':
+            from sentence_transformers import SentenceTransformer
+            model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
+            query = model.encode([args.text], normalize_embeddings=True).astype('float32')
+
+            start = time.perf_counter()
+            scores, rows, missing = coordinator.search(query, args.k)
+            elapsed = (time.perf_counter() - start) * 1000
+            if missing:
+                print(f"Warning: partial results, missing shards {missing}")
+
+            with open(f'data/{args.category}/metadata.json', 'r', encoding='utf-8') as f:
+                metadata = json.load(f)
+            for score, row in zip(scores[0], rows[0]):
+                print(f"{score:.4f}  {metadata[row]['title']}")
+            print(f"Search took {elapsed:.2f}ms")
+        else:
+            embeddings = np.load(f'data/{args.category}/embeddings.npy', mmap_mode='r')
+            rng = np.random.default_rng(0)
+            picks = np.sort(rng.choice(len(embeddings), size=min(args.queries, len(embeddings)), replace=False))
+            queries = np.ascontiguousarray(embeddings[picks], dtype='float32')
+
+            scores, rows, missing = coordinator.search(queries, args.k)
+            ref_scores, ref_rows = search_unsharded(args.category, queries, args.k)
+            if missing:
+                print(f"Verify failed: missing shards {missing}")
+            elif np.array_equal(rows, ref_rows) and np.array_equal(scores, ref_scores):
+                print(f"OK: {len(queries)} queries identical to unsharded search")
+            else:
+                mismatched = int((rows != ref_rows).any(axis=1).sum())
+                print(f"Verify failed: {mismatched}/{len(queries)} queries differ")
+    finally:
+        coordinator.close()
+
+if __name__ == '__main__':
+    main()